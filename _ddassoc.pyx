@@ -0,0 +1,88 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Cython build of the batch mapping kernel from duct_damper_association.py.
+Used below NUMBA_MIN_CANDIDATES or when Numba is not installed; build in place with:
+python setup.py build_ext --inplace
+"""
+from libc.math cimport INFINITY
+from libc.stdint cimport int64_t
+
+import numpy as np
+
+# Same values as IntersectionType in duct_damper_association.py
+cdef enum:
+    INTERSECTION_ACTUAL = 0
+    INTERSECTION_EXTENDED = 1
+    INTERSECTION_NONE = 2
+
+
+cdef inline double _ptl_sq(double px, double py, double x1, double y1, double x2, double y2,
+                           double dx, double dy, double len_sq, double extension,
+                           int* intersection_type) noexcept nogil:
+    # The segment is never degenerate; extract_duct_coordinates drops zero-length ducts
+    cdef double t_num, cross, dist_to_start_sq, dist_to_end_sq
+    
+    t_num = (px - x1) * dx + (py - y1) * dy
+    if 0 <= t_num <= len_sq:
+        intersection_type[0] = INTERSECTION_ACTUAL
+    elif -extension <= t_num <= len_sq + extension:
+        intersection_type[0] = INTERSECTION_EXTENDED
+    else:
+        # No intersection with extended segment
+        intersection_type[0] = INTERSECTION_NONE
+        dist_to_start_sq = (px - x1) * (px - x1) + (py - y1) * (py - y1)
+        dist_to_end_sq = (px - x2) * (px - x2) + (py - y2) * (py - y2)
+        return dist_to_start_sq if dist_to_start_sq < dist_to_end_sq else dist_to_end_sq
+    
+    # Squared perpendicular distance to the (extended) line: |AB x AP|^2 / |AB|^2
+    cross = dx * (py - y1) - dy * (px - x1)
+    return cross * cross / len_sq
+
+
+def compute(const double[:, ::1] points, segments, const int64_t[::1] offsets,
+            const int64_t[::1] candidates, double distance_threshold_sq):
+    """
+    Same contract as _ddassoc_numba.compute.
+    
+    Returns:
+        (M,) int64 array with the position of the best duct per damper, -1 if no association
+    """
+    cdef const double[::1] x1 = segments.x1
+    cdef const double[::1] y1 = segments.y1
+    cdef const double[::1] x2 = segments.x2
+    cdef const double[::1] y2 = segments.y2
+    cdef const double[::1] dx = segments.dx
+    cdef const double[::1] dy = segments.dy
+    cdef const double[::1] len_sq = segments.len_sq
+    cdef const double[::1] extension = segments.extension
+    
+    best_arr = np.full(points.shape[0], -1, dtype=np.int64)
+    cdef int64_t[::1] best = best_arr
+    cdef Py_ssize_t i, k
+    cdef int64_t j
+    cdef int intersection_type, best_type
+    cdef double px, py, distance_sq, best_distance_sq
+    
+    with nogil:
+        for i in range(points.shape[0]):
+            px = points[i, 0]
+            py = points[i, 1]
+            best_type = INTERSECTION_NONE
+            best_distance_sq = INFINITY
+            
+            for k in range(offsets[i], offsets[i + 1]):
+                j = candidates[k]
+                distance_sq = _ptl_sq(px, py, x1[j], y1[j], x2[j], y2[j], dx[j], dy[j],
+                                      len_sq[j], extension[j], &intersection_type)
+                if intersection_type == INTERSECTION_NONE or distance_sq > distance_threshold_sq:
+                    continue
+                
+                # Better intersection type first, then closer distance, then lower duct position
+                if (intersection_type < best_type or
+                        (intersection_type == best_type and
+                         (distance_sq < best_distance_sq or (distance_sq == best_distance_sq and j < best[i])))):
+                    best[i] = j
+                    best_distance_sq = distance_sq
+                    best_type = intersection_type
+    
+    return best_arr
@@ -0,0 +1,80 @@
+"""
+Numba build of the batch mapping kernel from duct_damper_association.py.
+Imported on first use by map_dampers_to_ducts, and only for problems with at least NUMBA_MIN_CANDIDATES
+candidate pairs, so smaller worksheets never pay for importing Numba or compiling the kernel.
+"""
+from typing import Tuple
+
+import numpy as np
+from numba import njit, prange
+
+# Same values as IntersectionType in duct_damper_association.py
+INTERSECTION_ACTUAL = 0
+INTERSECTION_EXTENDED = 1
+INTERSECTION_NONE = 2
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _segment_distance_sq(px: float, py: float, x1: float, y1: float, x2: float, y2: float,
+                         dx: float, dy: float, len_sq: float, extension: float) -> Tuple[float, int]:
+    # The segment is never degenerate; extract_duct_coordinates drops zero-length ducts
+    t_num = (px - x1) * dx + (py - y1) * dy
+    
+    if 0 <= t_num <= len_sq:
+        intersection_type = INTERSECTION_ACTUAL
+    elif -extension <= t_num <= len_sq + extension:
+        intersection_type = INTERSECTION_EXTENDED
+    else:
+        # No intersection with extended segment
+        dist_to_start_sq = (px - x1) ** 2 + (py - y1) ** 2
+        dist_to_end_sq = (px - x2) ** 2 + (py - y2) ** 2
+        return min(dist_to_start_sq, dist_to_end_sq), INTERSECTION_NONE
+    
+    # Squared perpendicular distance to the (extended) line: |AB x AP|^2 / |AB|^2
+    cross = dx * (py - y1) - dy * (px - x1)
+    return cross * cross / len_sq, intersection_type
+
+
+@njit(cache=True, fastmath=True, parallel=True, nogil=True)
+def compute(points: np.ndarray, segments, offsets: np.ndarray, candidates: np.ndarray,
+            distance_threshold_sq: float) -> np.ndarray:
+    """
+    Compiled batch mapping over the R-tree candidate lists.
+    Dampers are independent, so they are processed in parallel without holding the GIL.
+    
+    Args:
+        points: (M, 2) array of damper coordinates
+        segments: Prepared duct segments
+        offsets: (M + 1,) array, candidates[offsets[i]:offsets[i + 1]] are the ducts of damper i
+        candidates: Flat array of candidate duct positions
+        distance_threshold_sq: Squared maximum distance for damper-duct association
+    
+    Returns:
+        (M,) array with the position of the best duct per damper, -1 if no association
+    """
+    x1, y1, x2, y2 = segments.x1, segments.y1, segments.x2, segments.y2
+    dx, dy, len_sq, extension = segments.dx, segments.dy, segments.len_sq, segments.extension
+    best = np.full(points.shape[0], -1, dtype=np.int64)
+    
+    for i in prange(points.shape[0]):
+        px = points[i, 0]
+        py = points[i, 1]
+        best_type = INTERSECTION_NONE
+        best_distance_sq = np.inf
+        
+        for k in range(offsets[i], offsets[i + 1]):
+            j = candidates[k]
+            distance_sq, intersection_type = _segment_distance_sq(
+                px, py, x1[j], y1[j], x2[j], y2[j], dx[j], dy[j], len_sq[j], extension[j])
+            if intersection_type == INTERSECTION_NONE or distance_sq > distance_threshold_sq:
+                continue
+            
+            # Better intersection type first, then closer distance, then lower duct position
+            if (intersection_type < best_type or
+                    (intersection_type == best_type and
+                     (distance_sq < best_distance_sq or (distance_sq == best_distance_sq and j < best[i])))):
+                best[i] = j
+                best_distance_sq = distance_sq
+                best_type = intersection_type
+    
+    return best
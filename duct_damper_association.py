@@ -1,8 +1,29 @@
 # Import required modules
+import logging
 import math
 import sys
 import os
-from typing import Dict, List, Tuple, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from enum import IntEnum
+from typing import Dict, List, NamedTuple, Tuple, Any, Optional
+
+import numpy as np
+
+try:
+    import rtree.index
+except ImportError:
+    # rtree needs the libspatialindex C library; without it candidate ducts
+    # come from a plain bounding box test instead of the R-tree
+    rtree = None
+
+try:
+    # Optional Cython build of the batch mapping kernel, see setup.py
+    from _ddassoc import compute as _map_candidates_cython
+except ImportError:
+    _map_candidates_cython = None
 
 # Add the cks directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'cks'))
@@ -10,15 +31,291 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'cks'))
 from cks_sdk.models import FeatureType
 from cks_sdk.client import CKSClient
 
+logger = logging.getLogger(__name__)
+
 # Constants
 DEFAULT_DISTANCE_THRESHOLD = 13.0
 DUCT_EXTENSION_UNITS = 13.0
 
+# Candidate pairs from which map_dampers_to_ducts switches to the parallel Numba kernel. Importing
+# Numba and loading the cached kernel takes about 0.7 s (a few seconds when it has to compile),
+# which the NumPy implementation only spends on several million candidate pairs.
+NUMBA_MIN_CANDIDATES = 4_000_000
+
+# Up to this many candidate ducts map_damper_to_ducts checks them all directly; sorting them by
+# bounding box distance for an early exit only pays off for more candidates.
+SCAN_MAX_CANDIDATES = 16
+
+# Numba's workqueue threading layer (the fallback without TBB or OpenMP) aborts the process when
+# parallel kernels are launched from several threads at once, so launches of the Numba kernel are
+# serialized. Each launch already runs on all cores.
+_map_candidates_numba_lock = threading.Lock()
+
+
+class IntersectionType(IntEnum):
+    """
+    Where the perpendicular from a point meets a duct line segment.
+    Lower values take priority when choosing a duct.
+    """
+    ACTUAL = 0  # perpendicular intersects the original line segment
+    EXTENDED = 1  # perpendicular intersects the extended line segment (but not original)
+    NONE = 2  # no intersection
+
+
+# Plain int codes of IntersectionType returned by the point-to-segment kernels; _INTERSECTION_TYPES
+# maps a code back to its member, so the enum is only built at the public API.
+_ACTUAL = IntersectionType.ACTUAL.value
+_EXTENDED = IntersectionType.EXTENDED.value
+_NONE = IntersectionType.NONE.value
+_INTERSECTION_TYPES = tuple(IntersectionType)
+
+
+@dataclass
+class Ducts:
+    """
+    Duct line segments with their coordinates stored as parallel arrays.
+    
+    Attributes:
+        ids: Duct IDs, in the same order as the coordinate arrays
+        xy1: (N, 2) array of line segment start coordinates
+        xy2: (N, 2) array of line segment end coordinates
+    """
+    ids: List[str]
+    xy1: np.ndarray
+    xy2: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @cached_property
+    def segments(self) -> '_Segments':
+        """
+        Per-segment invariants, computed on first use.
+        """
+        return _prepare_segments(self.xy1, self.xy2)
+    
+    @cached_property
+    def index(self) -> Optional['rtree.index.Index']:
+        """
+        R-tree over the segment bounding boxes whose ids are positions in the duct arrays,
+        or None if rtree is not installed.
+        """
+        if rtree is None or not self.ids:
+            return None
+        segments = self.segments
+        bounds = zip(segments.x_min.tolist(), segments.y_min.tolist(),
+                     segments.x_max.tolist(), segments.y_max.tolist())
+        return rtree.index.Index((duct_idx, bbox, None) for duct_idx, bbox in enumerate(bounds))
+    
+    @cached_property
+    def kernel_args(self) -> List[Tuple[float, ...]]:
+        """
+        Per-segment arguments of _segment_distance_sq after the point, as Python floats.
+        """
+        segments = self.segments
+        return list(zip(segments.x1.tolist(), segments.y1.tolist(), segments.x2.tolist(), segments.y2.tolist(),
+                        segments.dx.tolist(), segments.dy.tolist(), segments.len_sq.tolist(),
+                        segments.extension.tolist()))
+
+
+class _Segments(NamedTuple):
+    """
+    Per-segment invariants of the duct line segments, stored as parallel arrays.
+    """
+    x1: np.ndarray
+    y1: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    dx: np.ndarray
+    dy: np.ndarray
+    len_sq: np.ndarray
+    # DUCT_EXTENSION_UNITS scaled into the units of t_num (extension * segment length)
+    extension: np.ndarray
+    # Axis-aligned bounding box of the segment
+    x_min: np.ndarray
+    y_min: np.ndarray
+    x_max: np.ndarray
+    y_max: np.ndarray
+
+
+def _prepare_segments(seg_start: np.ndarray, seg_end: np.ndarray) -> _Segments:
+    """
+    Precompute the values that only depend on the duct segments, once per segment.
+    
+    Args:
+        seg_start: (..., 2) array of line segment start coordinates
+        seg_end: (..., 2) array of line segment end coordinates
+        
+    Returns:
+        _Segments with arrays of shape (...)
+    """
+    x1 = np.ascontiguousarray(seg_start[..., 0], dtype=np.float64)
+    y1 = np.ascontiguousarray(seg_start[..., 1], dtype=np.float64)
+    x2 = np.ascontiguousarray(seg_end[..., 0], dtype=np.float64)
+    y2 = np.ascontiguousarray(seg_end[..., 1], dtype=np.float64)
+    dx = x2 - x1
+    dy = y2 - y1
+    len_sq = dx * dx + dy * dy
+    extension = DUCT_EXTENSION_UNITS * np.hypot(dx, dy)
+    return _Segments(x1, y1, x2, y2, dx, dy, len_sq, extension,
+                     np.minimum(x1, x2), np.minimum(y1, y2), np.maximum(x1, x2), np.maximum(y1, y2))
+
+
+def _bbox_candidates(points: np.ndarray, segments: _Segments, pad: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find candidate ducts per damper with a bounding box test, used when rtree is not installed.
+    
+    Args:
+        points: (M, 2) array of damper coordinates
+        segments: Prepared duct segments
+        pad: Distance the segment bounding boxes are expanded by
+        
+    Returns:
+        Tuple of (candidates, counts) in the same layout as rtree's intersection_v: the flat
+        candidate duct positions, grouped per damper, and the number of candidates per damper
+    """
+    px = points[:, 0:1]
+    py = points[:, 1:2]
+    inside = ((px >= segments.x_min - pad) & (px <= segments.x_max + pad) &
+              (py >= segments.y_min - pad) & (py <= segments.y_max + pad))
+    damper_idx, candidates = np.nonzero(inside)
+    return candidates, np.bincount(damper_idx, minlength=len(points))
+
+
+def _segments_distance_sq(px: np.ndarray, py: np.ndarray, segments: _Segments) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    NumPy point-to-segment kernel behind _map_candidates_vectorized, working on prepared segments.
+    All arguments are broadcast against each other. Segments must not be degenerate.
+    """
+    apx = px - segments.x1
+    apy = py - segments.y1
+    
+    # Numerator of the parameter t, compared against the segment in units of len_sq
+    t_num = apx * segments.dx + apy * segments.dy
+    actual = (t_num >= 0) & (t_num <= segments.len_sq)
+    extended = ~actual & (t_num >= -segments.extension) & (t_num <= segments.len_sq + segments.extension)
+    
+    # Squared perpendicular distance |AB x AP|^2 / |AB|^2
+    cross = segments.dx * apy - segments.dy * apx
+    distances_sq = cross * cross / segments.len_sq
+    
+    intersection_types = np.full(t_num.shape, IntersectionType.NONE, dtype=np.int8)
+    intersection_types[actual] = IntersectionType.ACTUAL
+    intersection_types[extended] = IntersectionType.EXTENDED
+    
+    # Without intersection the distance falls back to the closest endpoint
+    none = intersection_types == IntersectionType.NONE
+    if none.any():
+        dist_to_start_sq = apx * apx + apy * apy
+        dist_to_end_sq = (px - segments.x2) ** 2 + (py - segments.y2) ** 2
+        distances_sq = np.where(none, np.minimum(dist_to_start_sq, dist_to_end_sq), distances_sq)
+    
+    return distances_sq, intersection_types
+
+
+def _segment_distance_sq(px: float, py: float, x1: float, y1: float, x2: float, y2: float,
+                         dx: float, dy: float, len_sq: float, extension: float) -> Tuple[float, int]:
+    """
+    Point-to-segment kernel working on the precomputed segment invariants.
+    Works on squared distances so callers only take a square root when they need the distance itself.
+    The segment must not be degenerate; extract_duct_coordinates drops zero-length ducts.
+    
+    Returns:
+        Tuple of (distance_sq, intersection_type) where intersection_type is an IntersectionType int code
+    """
+    # Numerator of the parameter t for the closest point on the line (t = t_num / len_sq)
+    t_num = (px - x1) * dx + (py - y1) * dy
+    
+    if 0 <= t_num <= len_sq:
+        intersection_type = _ACTUAL
+    elif -extension <= t_num <= len_sq + extension:
+        intersection_type = _EXTENDED
+    else:
+        # No intersection with extended segment
+        dist_to_start_sq = (px - x1) ** 2 + (py - y1) ** 2
+        dist_to_end_sq = (px - x2) ** 2 + (py - y2) ** 2
+        return min(dist_to_start_sq, dist_to_end_sq), _NONE
+    
+    # Squared perpendicular distance to the (extended) line: |AB x AP|^2 / |AB|^2
+    cross = dx * (py - y1) - dy * (px - x1)
+    return cross * cross / len_sq, intersection_type
+
+
+def _point_to_line(px: float, py: float, x1: float, y1: float, x2: float, y2: float,
+                   ext_units: float) -> Tuple[float, int]:
+    """
+    Kernel behind DuctDamperAssociation.point_to_line_distance.
+    
+    Returns:
+        Tuple of (distance_sq, intersection_type) where intersection_type is an IntersectionType int code
+    """
+    dx = x2 - x1
+    dy = y2 - y1
+    len_sq = dx * dx + dy * dy
+    
+    if len_sq == 0:
+        # Line segment is actually a point
+        return (px - x1) ** 2 + (py - y1) ** 2, _ACTUAL
+    
+    return _segment_distance_sq(px, py, x1, y1, x2, y2, dx, dy, len_sq, ext_units * math.hypot(dx, dy))
+
+
+@lru_cache(maxsize=None)
+def _map_candidates_numba():
+    """
+    Import the parallel Numba batch kernel (_ddassoc_numba.compute) on first use.
+    Returns None if Numba is not installed.
+    """
+    try:
+        from _ddassoc_numba import compute
+    except ImportError:
+        return None
+    return compute
+
+
+def _map_candidates_vectorized(points: np.ndarray, segments: _Segments, counts: np.ndarray,
+                               candidates: np.ndarray, distance_threshold_sq: float) -> np.ndarray:
+    """
+    NumPy implementation of the batch kernels in _ddassoc_numba and _ddassoc,
+    used when the Numba kernel is not used and the Cython kernel is not built.
+    Takes the per-damper candidate counts instead of offsets.
+    """
+    damper_idx = np.repeat(np.arange(len(points)), counts.astype(np.intp))
+    duct_idx = candidates
+    
+    # Exact perpendicular distance for the candidate pairs only
+    distances_sq, intersection_types = _segments_distance_sq(
+        points[damper_idx, 0], points[damper_idx, 1], _Segments(*(values[duct_idx] for values in segments)))
+    keep = (intersection_types != IntersectionType.NONE) & (distances_sq <= distance_threshold_sq)
+    damper_idx = damper_idx[keep]
+    duct_idx = duct_idx[keep]
+    distances_sq = distances_sq[keep]
+    intersection_types = intersection_types[keep]
+    
+    # Per damper: actual intersections before extended ones, then closest distance, then duct order.
+    # Each criterion is a grouped minimum, so only the surviving pairs are narrowed down without sorting.
+    best_type = np.full(len(points), IntersectionType.NONE, dtype=np.int8)
+    np.minimum.at(best_type, damper_idx, intersection_types)
+    keep = intersection_types == best_type[damper_idx]
+    damper_idx = damper_idx[keep]
+    duct_idx = duct_idx[keep]
+    distances_sq = distances_sq[keep]
+    
+    best_distance_sq = np.full(len(points), np.inf)
+    np.minimum.at(best_distance_sq, damper_idx, distances_sq)
+    keep = distances_sq == best_distance_sq[damper_idx]
+    
+    no_duct = np.iinfo(np.int64).max
+    best = np.full(len(points), no_duct, dtype=np.int64)
+    np.minimum.at(best, damper_idx[keep], duct_idx[keep])
+    best[best == no_duct] = -1
+    return best
+
 
 class DuctDamperAssociation:
     """
     Class for associating dampers with ducts based on perpendicular distance calculations.
-    Uses one-to-one mapping to ensure each duct can only be assigned to one damper.
+    Each damper is mapped to its best duct independently, so several dampers can share a duct.
     """
     
     def __init__(self, distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD, use_mock: bool = True):
@@ -33,7 +330,7 @@ class DuctDamperAssociation:
         # Initialize CKS client with mock data for testing
         self.cks_client = CKSClient(use_mock=use_mock)
     
-    def point_to_line_distance(self, point: Tuple[float, float], line_start: Tuple[float, float], line_end: Tuple[float, float]) -> Tuple[float, str]:
+    def point_to_line_distance(self, point: Tuple[float, float], line_start: Tuple[float, float], line_end: Tuple[float, float]) -> Tuple[float, IntersectionType]:
         """
         Calculate the perpendicular distance from a point to a line segment with extensions.
         
@@ -44,48 +341,13 @@ class DuctDamperAssociation:
             
         Returns:
             Tuple of (distance, intersection_type) where intersection_type is:
-            - "actual": perpendicular intersects the original line segment
-            - "extended": perpendicular intersects the extended line segment (but not original)
-            - "none": no intersection
+            - IntersectionType.ACTUAL: perpendicular intersects the original line segment
+            - IntersectionType.EXTENDED: perpendicular intersects the extended line segment (but not original)
+            - IntersectionType.NONE: no intersection
         """
-        px, py = point
-        x1, y1 = line_start
-        x2, y2 = line_end
-        
-        # Calculate the squared length of the line segment
-        line_length_sq = (x2 - x1) ** 2 + (y2 - y1) ** 2
-        
-        if line_length_sq == 0:
-            # Line segment is actually a point
-            distance = math.sqrt((px - x1) ** 2 + (py - y1) ** 2)
-            return distance, "actual"
-        
-        # Calculate the parameter t for the closest point on the line
-        t = ((px - x1) * (x2 - x1) + (py - y1) * (y2 - y1)) / line_length_sq
-        
-        # Calculate line length for absolute extension
-        line_length = math.sqrt(line_length_sq)
-        extension_ratio = DUCT_EXTENSION_UNITS / line_length  # Extension units as ratio of line length
-        
-        # Check intersection types
-        if 0 <= t <= 1:
-            # Perpendicular intersects the original line segment
-            closest_x = x1 + t * (x2 - x1)
-            closest_y = y1 + t * (y2 - y1)
-            distance = math.sqrt((px - closest_x) ** 2 + (py - closest_y) ** 2)
-            return distance, "actual"
-        elif -extension_ratio <= t <= 1 + extension_ratio:
-            # Perpendicular intersects the extended line segment (DUCT_EXTENSION_UNITS extension on each side)
-            closest_x = x1 + t * (x2 - x1)
-            closest_y = y1 + t * (y2 - y1)
-            distance = math.sqrt((px - closest_x) ** 2 + (py - closest_y) ** 2)
-            return distance, "extended"
-        else:
-            # No intersection with extended segment
-            dist_to_start = math.sqrt((px - x1) ** 2 + (py - y1) ** 2)
-            dist_to_end = math.sqrt((px - x2) ** 2 + (py - y2) ** 2)
-            distance = min(dist_to_start, dist_to_end)
-            return distance, "none"
+        distance_sq, intersection_type = _point_to_line(
+            point[0], point[1], line_start[0], line_start[1], line_end[0], line_end[1], DUCT_EXTENSION_UNITS)
+        return math.sqrt(distance_sq), _INTERSECTION_TYPES[intersection_type]
     
     def extract_damper_coordinates(self, dampers: List[Any]) -> List[Tuple[str, Tuple[float, float]]]:
         """
@@ -100,22 +362,16 @@ class DuctDamperAssociation:
         damper_coords = []
         
         for damper in dampers:
-            damper_id = getattr(damper, 'id', 'unknown')
-            coordinates = None
-            
-            if hasattr(damper, 'final_geojson') and damper.final_geojson:
-                geojson = damper.final_geojson
-                if hasattr(geojson, 'features') and geojson.features:
-                    coords = geojson.features[0].geometry.coordinates
-                    if len(coords) >= 2:
-                        coordinates = (float(coords[0]), float(coords[1]))
-            
-            if coordinates:
-                damper_coords.append((damper_id, coordinates))
+            # Dampers without a usable point geometry are skipped
+            try:
+                coords = damper.final_geojson.features[0].geometry.coordinates
+                damper_coords.append((getattr(damper, 'id', 'unknown'), (float(coords[0]), float(coords[1]))))
+            except (AttributeError, IndexError, TypeError):
+                continue
         
         return damper_coords
     
-    def extract_duct_coordinates(self, ducts: List[Any]) -> List[Tuple[str, Tuple[float, float], Tuple[float, float]]]:
+    def extract_duct_coordinates(self, ducts: List[Any]) -> Ducts:
         """
         Extract duct ID and line segment coordinates from ducts data.
         Since ducts only contain one line segment, we extract start and end points.
@@ -124,71 +380,151 @@ class DuctDamperAssociation:
             ducts: List of duct objects from CKS
             
         Returns:
-            List of tuples (duct_id, start_point, end_point)
+            Ducts with the IDs and the start and end point arrays
         """
-        duct_coords = []
+        duct_ids = []
+        coordinates = []
         
         for duct in ducts:
-            duct_id = getattr(duct, 'id', 'unknown')
-            start_point = None
-            end_point = None
+            # Ducts without a usable line geometry are skipped
+            try:
+                coords = duct.final_geojson['features'][0]['geometry']['coordinates']
+                segment = (float(coords[0][0]), float(coords[0][1]), float(coords[1][0]), float(coords[1][1]))
+            except (AttributeError, IndexError, KeyError, TypeError):
+                continue
             
-            if hasattr(duct, 'final_geojson') and duct.final_geojson:
-                geojson = duct.final_geojson
-                if isinstance(geojson, dict) and 'features' in geojson:
-                    feature = geojson['features'][0]
-                    if 'geometry' in feature and 'coordinates' in feature['geometry']:
-                        coords = feature['geometry']['coordinates']
-                        if len(coords) >= 2:
-                            start_point = (float(coords[0][0]), float(coords[0][1]))
-                            end_point = (float(coords[1][0]), float(coords[1][1]))
+            duct_id = getattr(duct, 'id', 'unknown')
+            if segment[:2] == segment[2:]:
+                # Zero-length segments are dropped here so the mapping kernels never see them
+                logger.warning("Skipping duct %s with a zero-length line segment", duct_id)
+                continue
             
-            if start_point and end_point:
-                duct_coords.append((duct_id, start_point, end_point))
+            duct_ids.append(duct_id)
+            coordinates.extend(segment)
         
-        return duct_coords
+        xy = np.fromiter(coordinates, dtype=np.float64, count=len(coordinates)).reshape(-1, 4)
+        return Ducts(duct_ids, np.ascontiguousarray(xy[:, :2]), np.ascontiguousarray(xy[:, 2:]))
     
     def map_damper_to_ducts(self, damper_coord: Tuple[str, Tuple[float, float]], 
-                           duct_coords: List[Tuple[str, Tuple[float, float], Tuple[float, float]]]) -> str:
+                           ducts: Ducts) -> str:
         """
         Map a single damper to the closest duct based on perpendicular distance.
         Prioritizes actual intersections over extended intersections.
         Multiple dampers can be associated with the same duct.
+        For many dampers use map_dampers_to_ducts, which maps them all in one pass.
         
         Args:
             damper_coord: (damper_id, (x, y)) tuple
-            duct_coords: List of (duct_id, start_point, end_point) tuples
+            ducts: Duct line segments from extract_duct_coordinates
             
         Returns:
             duct_id if association is made, 'NA' if no association
         """
-        damper_id, damper_point = damper_coord
+        damper_id, (px, py) = damper_coord
+        if not ducts:
+            return 'NA'
         
-        # Find the best duct for this damper
-        best_duct_id = 'NA'
-        best_distance = float('inf')
-        best_intersection_type = "none"
+        # Small worksheets are checked duct by duct, without the R-tree query
+        if len(ducts) <= SCAN_MAX_CANDIDATES:
+            candidates = range(len(ducts))
+        else:
+            pad = self.distance_threshold + DUCT_EXTENSION_UNITS
+            if ducts.index is not None:
+                candidates = list(ducts.index.intersection((px - pad, py - pad, px + pad, py + pad)))
+            else:
+                candidates = _bbox_candidates(np.array([[px, py]]), ducts.segments, pad)[0].tolist()
+        
+        bbox_distances_sq = None
+        if len(candidates) > SCAN_MAX_CANDIDATES:
+            # Visit the candidates nearest bounding box first. An actual intersection is never closer
+            # than its segment's bounding box, so once the best duct is an actual intersection every
+            # remaining candidate whose box is farther away can be skipped.
+            segments = ducts.segments
+            candidates = np.array(candidates, dtype=np.int64)
+            gap_x = np.maximum(np.maximum(segments.x_min[candidates] - px, px - segments.x_max[candidates]), 0)
+            gap_y = np.maximum(np.maximum(segments.y_min[candidates] - py, py - segments.y_max[candidates]), 0)
+            bbox_distances_sq = gap_x * gap_x + gap_y * gap_y
+            order = np.lexsort((candidates, bbox_distances_sq))
+            candidates = candidates[order].tolist()
+            bbox_distances_sq = bbox_distances_sq[order].tolist()
+        
+        kernel_args = ducts.kernel_args
+        threshold_sq = self.distance_threshold ** 2
+        best_duct_idx = -1
+        best_distance_sq = float('inf')
+        best_intersection_type = _NONE
         
-        for duct_id, start_point, end_point in duct_coords:
-            # Calculate distance to the single line segment of this duct
-            distance, intersection_type = self.point_to_line_distance(damper_point, start_point, end_point)
+        for k, duct_idx in enumerate(candidates):
+            if (bbox_distances_sq is not None and best_intersection_type == _ACTUAL and
+                    bbox_distances_sq[k] > best_distance_sq):
+                break
             
-            # Check if this duct is better than current best
-            if intersection_type != "none" and distance <= self.distance_threshold:
-                # Priority: actual=0, extended=1 (so actual comes first)
-                current_priority = 0 if intersection_type == "actual" else 1
-                best_priority = 0 if best_intersection_type == "actual" else 1
-                
-                # Update best if:
-                # 1. Better intersection type (actual > extended)
-                # 2. Same intersection type but closer distance
-                if (current_priority < best_priority or 
-                    (current_priority == best_priority and distance < best_distance)):
-                    best_duct_id = duct_id
-                    best_distance = distance
-                    best_intersection_type = intersection_type
+            distance_sq, intersection_type = _segment_distance_sq(px, py, *kernel_args[duct_idx])
+            if intersection_type == _NONE or distance_sq > threshold_sq:
+                continue
+            
+            # Update best if:
+            # 1. Better intersection type (actual > extended)
+            # 2. Same intersection type but closer distance (ties go to the earlier duct)
+            if (intersection_type < best_intersection_type or
+                    (intersection_type == best_intersection_type and
+                     (distance_sq < best_distance_sq or
+                      (distance_sq == best_distance_sq and duct_idx < best_duct_idx)))):
+                best_duct_idx = duct_idx
+                best_distance_sq = distance_sq
+                best_intersection_type = intersection_type
         
-        return best_duct_id
+        return ducts.ids[best_duct_idx] if best_duct_idx >= 0 else 'NA'
+    
+    def map_dampers_to_ducts(self, damper_coords: List[Tuple[str, Tuple[float, float]]],
+                             ducts: Ducts) -> Dict[str, str]:
+        """
+        Map all dampers to their closest ducts in a single vectorized pass.
+        Applies the same rules as map_damper_to_ducts to every damper at once.
+        
+        Args:
+            damper_coords: List of (damper_id, (x, y)) tuples
+            ducts: Duct line segments from extract_duct_coordinates
+            
+        Returns:
+            Dictionary mapping damper_id to duct_id, or 'NA' if no association
+        """
+        if not damper_coords:
+            return {}
+        if not ducts:
+            return {damper_id: 'NA' for damper_id, _ in damper_coords}
+        
+        points = np.array([damper_point for _, damper_point in damper_coords], dtype=np.float64)
+        segments = ducts.segments
+        
+        # Broad phase: only ducts whose bounding box lies within reach of a damper are candidates
+        pad = self.distance_threshold + DUCT_EXTENSION_UNITS
+        if ducts.index is not None:
+            candidates, counts = ducts.index.intersection_v(points - pad, points + pad)
+        else:
+            candidates, counts = _bbox_candidates(points, segments, pad)
+        
+        # Narrow phase: exact perpendicular distance for the candidate pairs only
+        # The parallel Numba kernel only pays off for large problems; below that the Cython kernel
+        # (when built) or the NumPy implementation is faster than importing and loading Numba.
+        threshold_sq = self.distance_threshold ** 2
+        map_candidates_numba = _map_candidates_numba() if len(candidates) >= NUMBA_MIN_CANDIDATES else None
+        if map_candidates_numba is not None or _map_candidates_cython is not None:
+            offsets = np.zeros(len(points) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            candidates = np.ascontiguousarray(candidates, dtype=np.int64)
+            if map_candidates_numba is not None:
+                with _map_candidates_numba_lock:
+                    best = map_candidates_numba(points, segments, offsets, candidates, threshold_sq)
+            else:
+                best = _map_candidates_cython(points, segments, offsets, candidates, threshold_sq)
+        else:
+            best = _map_candidates_vectorized(points, segments, counts, candidates, threshold_sq)
+        
+        return {
+            damper_id: ducts.ids[best_idx] if best_idx >= 0 else 'NA'
+            for (damper_id, _), best_idx in zip(damper_coords, best)
+        }
     
     def retrieve_data_from_cks(self, worksheet_id: str) -> Tuple[List[Any], List[Any]]:
         """
@@ -243,17 +579,30 @@ class DuctDamperAssociation:
             damper_coords = self.extract_damper_coordinates(dampers)
             duct_coords = self.extract_duct_coordinates(ducts)
             
-            # Perform mapping for each damper individually
-            damper_duct_mapping = {}
-            for damper_coord in damper_coords:
-                damper_id = damper_coord[0]
-                duct_id = self.map_damper_to_ducts(damper_coord, duct_coords)
-                damper_duct_mapping[damper_id] = duct_id
-            
-            return damper_duct_mapping
+            # Perform mapping for all dampers at once
+            return self.map_dampers_to_ducts(damper_coords, duct_coords)
             
         except Exception as e:
             raise Exception(f"Failed to process worksheet {worksheet_id}: {str(e)}")
+    
+    def process_worksheets(self, worksheet_ids: List[str], max_workers: int = 8) -> Dict[str, Dict[str, str]]:
+        """
+        Process several worksheets concurrently, sharing the CKS client.
+        CKS requests for one worksheet overlap with the mapping of the others; the parallel
+        Numba kernel itself is launched by one worksheet at a time.
+        
+        Args:
+            worksheet_ids: IDs of the worksheets to process
+            max_workers: Maximum number of worksheets processed at the same time
+            
+        Returns:
+            Dictionary mapping worksheet_id to its damper-to-duct mapping
+            
+        Raises:
+            Exception: If processing any of the worksheets fails
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(worksheet_ids, executor.map(self.process_worksheet, worksheet_ids)))
 
 
 def main():
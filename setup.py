@@ -0,0 +1,15 @@
+# Builds the optional Cython kernel used by duct_damper_association.py below NUMBA_MIN_CANDIDATES
+# or when Numba is not installed:
+#   python setup.py build_ext --inplace
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    ext_modules=cythonize([
+        Extension(
+            "_ddassoc",
+            ["_ddassoc.pyx"],
+            extra_compile_args=["-O3", "-march=native", "-ffast-math"],
+        )
+    ]),
+)
@@ -1,28 +1,117 @@
 import cv2
 import numpy as np
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import simplejpeg
+except ImportError:
+    # simplejpeg is optional; JPEGs are decoded and encoded with OpenCV without it
+    simplejpeg = None
 
 # Import required modules
 from cks_client import CKSClientManager
 from cks_sdk.models import FeatureType
 from activities.helpers import load_image_data
 
+# Shared drawing colors (BGR format for OpenCV)
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+BLUE = (255, 0, 0)
+
+# Damper marker (color, radius) by damper type (BGR format for OpenCV)
+DAMPER_STYLES = {
+    'CRD': ((0, 0, 255), 8),  # Red
+    'MVD': ((0, 255, 0), 10),  # Green
+}
+DEFAULT_DAMPER_STYLE = ((0, 165, 255), 6)  # Orange
+
+# Baseline JPEG without the optimize/progressive passes; plenty for a visualization
+JPEG_QUALITY = 85
+
+# Output image format: 'jpg', or 'png' for lossless output of mostly flat worksheet renders
+OUTPUT_FORMAT = 'jpg'
+
+# Fast RLE-only PNG compression; flat backgrounds with sparse overlays compress well with it
+PNG_PARAMS = [cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE, cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+
+def to_image_points(coords, transform):
+    """
+    Map PDF (x, y) coordinates through a 2x3 affine transform to int32 image points of shape (N, 1, 2).
+    """
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 1, 2)
+    if len(points):
+        points = cv2.transform(points, transform)
+    return points.astype(np.int32)
+
+
+def decode_image(image_bytes):
+    """
+    Decode the worksheet image bytes into a BGR image.
+    JPEGs are decoded with simplejpeg (libjpeg-turbo fast IDCT) when available, anything else with OpenCV.
+    """
+    # Flat byte view of any bytes-like input, shared by both decoders without copying
+    buffer = memoryview(image_bytes).cast('B')
+    if simplejpeg is not None and buffer[:3] == b'\xff\xd8\xff':
+        return simplejpeg.decode_jpeg(buffer, colorspace='BGR', fastdct=True, fastupsample=True)
+    return cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def write_jpeg(path, image):
+    """
+    Encode a BGR image as JPEG in memory and write the bytes to path.
+    Uses simplejpeg (libjpeg-turbo) when available.
+    """
+    if simplejpeg is not None:
+        buffer = simplejpeg.encode_jpeg(image, quality=JPEG_QUALITY, colorspace='BGR')
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0, cv2.IMWRITE_JPEG_PROGRESSIVE, 0]
+        buffer = cv2.imencode('.jpg', image, params)[1].tobytes()
+    with open(path, 'wb') as f:
+        f.write(buffer)
+
+
+def write_png(path, image):
+    """
+    Encode a BGR image as PNG in memory and write the bytes to path.
+    """
+    buffer = cv2.imencode('.png', image, PNG_PARAMS)[1].tobytes()
+    with open(path, 'wb') as f:
+        f.write(buffer)
+
+
+IMAGE_WRITERS = {
+    'jpg': write_jpeg,
+    'png': write_png,
+}
+
 # Initialize CKS client
 cks_v2 = CKSClientManager.get_instance().client
 
 # Set worksheet_id
 worksheet_id = "6371abad-c847-4117-8fe9-446edc0261ec"
 
-print("Fetching worksheet image...")
 # Get image for visualization
 zoom_factor = 2
-image_data = cks_v2.worksheets.get_image_by_zoom(worksheet_id, zoom=zoom_factor, bg_removal=False)
+
+# The image, metadata, ducts and dampers are independent requests, so fetch them concurrently
+print("Fetching worksheet image, metadata, ducts and dampers from CKS...")
+with ThreadPoolExecutor(max_workers=4) as pool:
+    image_future = pool.submit(cks_v2.worksheets.get_image_by_zoom, worksheet_id, zoom=zoom_factor, bg_removal=False)
+    meta_future = pool.submit(cks_v2.worksheets.get_worksheet_meta, worksheet_id)
+    ducts_future = pool.submit(cks_v2.ducts_fittings.get_ducts_by_worksheet, worksheet_id)
+    dampers_future = pool.submit(cks_v2.points.get_point_features, worksheet_id, type=FeatureType.DAMPER)
+
+    image_data = image_future.result()
+    meta_data = meta_future.result()
+    unnamed_duct_in_cks = ducts_future.result()
+    saved_output = dampers_future.result()
+
 image_bytes = load_image_data(image_data)
-image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+image = decode_image(image_bytes)
 
 # Get scale factors from worksheet metadata
-print("Getting worksheet metadata for scale factors...")
-meta_data = cks_v2.worksheets.get_worksheet_meta(worksheet_id)
 page_width = meta_data["page_width"]
 page_height = meta_data["page_height"]
 fe_width = meta_data["fe_width"]
@@ -34,18 +123,12 @@ scale_factor_y = page_height / fe_height
 print(f"Scale factors - X: {scale_factor_x}, Y: {scale_factor_y}")
 print(f"Zoom factor: {zoom_factor}")
 
-# Create a copy for drawing
-image_with_overlay = image.copy()
+# Draw directly on the decoded image; the original is not needed afterwards
+image_with_overlay = image
+del image
 
-print("Retrieving ducts from CKS...")
-# Get ducts from CKS
-unnamed_duct_in_cks = cks_v2.ducts_fittings.get_ducts_by_worksheet(worksheet_id)
 print(f"Retrieved {len(unnamed_duct_in_cks)} ducts")
 
-print("Retrieving dampers from CKS...")
-# Get dampers from CKS
-saved_output = cks_v2.points.get_point_features(worksheet_id, type=FeatureType.DAMPER)
-
 # Handle both list and PointsGenerationOutput formats
 if hasattr(saved_output, 'data') and 'results' in saved_output.data:
     saved_dampers = saved_output.data['results']
@@ -56,88 +139,97 @@ else:
 
 print(f"Retrieved {len(saved_dampers)} dampers")
 
+# PDF to image coordinates as an affine matrix: scale by the scale factors and zoom factor, and flip the Y axis
+pdf_to_image = np.array([
+    [scale_factor_x * zoom_factor, 0, 0],
+    [0, -scale_factor_y * zoom_factor, 0],
+], dtype=np.float64)
+
+
+# Flatten duct geometry into plain coordinate lists before drawing
+duct_coords = [
+    duct.final_geojson['features'][0]['geometry']['coordinates']
+    for duct in unnamed_duct_in_cks
+    if getattr(duct, 'final_geojson', None) and duct.final_geojson.get('features')
+    and 'coordinates' in duct.final_geojson['features'][0].get('geometry', ())
+]
+
+# Flatten damper geometry and attributes into plain tuples before drawing
+damper_records = [
+    (damper.final_geojson.features[0].geometry.coordinates,
+     getattr(damper, 'type', 'Unknown'), getattr(damper, 'confidence', 0), getattr(damper, 'id', f'D{i}'))
+    for i, damper in enumerate(saved_dampers)
+    if getattr(damper, 'final_geojson', None) and getattr(damper.final_geojson, 'features', None)
+    and hasattr(damper.final_geojson.features[0].geometry, 'coordinates')
+]
+
 # Draw ducts as lines
 print("Drawing ducts...")
-for i, duct in enumerate(unnamed_duct_in_cks):
-    if hasattr(duct, 'final_geojson') and duct.final_geojson:
-        geojson = duct.final_geojson
-        if 'features' in geojson and geojson['features']:
-            feature = geojson['features'][0]
-            if 'geometry' in feature and 'coordinates' in feature['geometry']:
-                coords = feature['geometry']['coordinates']
-                if len(coords) >= 2:
-                    # Convert coordinates to image space by multiplying by scale factors and zoom factor
-                    points = []
-                    for coord in coords:
-                        # Convert from PDF coordinates to image coordinates
-                        x = int(coord[0] * scale_factor_x * zoom_factor)
-                        y = int(coord[1] * scale_factor_y * zoom_factor * -1)  # Flip Y axis
-                        points.append((x, y))
-                    
-                    # Draw line
-                    if len(points) >= 2:
-                        cv2.polylines(image_with_overlay, [np.array(points)], False, (255, 0, 0), 2)  # Blue lines
-
-# Draw dampers as points
+# Convert every duct vertex to image space in one contiguous buffer, then draw all ducts in a single call
+drawn_duct_coords = [coords for coords in duct_coords if len(coords) >= 2]
+# Only x and y are projected; GeoJSON vertices may carry a third (z) value
+duct_points = to_image_points(
+    np.concatenate([np.asarray(coords, dtype=np.float64)[:, :2] for coords in drawn_duct_coords])
+    if drawn_duct_coords else [], pdf_to_image)
+duct_ends = np.cumsum([len(coords) for coords in drawn_duct_coords], dtype=np.intp)
+duct_polylines = np.split(duct_points, duct_ends[:-1]) if len(duct_ends) else []  # Views into duct_points
+if duct_polylines:
+    cv2.polylines(image_with_overlay, duct_polylines, False, BLUE, 2)  # Blue lines
+
+# Collect damper coordinates and attributes
 print("Drawing dampers...")
-for i, damper in enumerate(saved_dampers):
-    if hasattr(damper, 'final_geojson') and damper.final_geojson:
-        geojson = damper.final_geojson
-        if hasattr(geojson, 'features') and geojson.features:
-            feature = geojson.features[0]
-            if hasattr(feature.geometry, 'coordinates'):
-                coords = feature.geometry.coordinates
-                if len(coords) >= 2:
-                    # Convert from PDF coordinates to image coordinates
-                    x = int(coords[0] * scale_factor_x * zoom_factor)
-                    y = int(coords[1] * scale_factor_y * zoom_factor * -1)  # Flip Y axis
-                    
-                    # Get damper type for color coding
-                    damper_type = getattr(damper, 'type', 'Unknown')
-                    confidence = getattr(damper, 'confidence', 0)
-                    damper_id = getattr(damper, 'id', f'D{i}')
-                    
-                    # Color code by type (BGR format for OpenCV)
-                    if damper_type == 'CRD':
-                        color = (0, 0, 255)  # Red
-                        radius = 8
-                    elif damper_type == 'MVD':
-                        color = (0, 255, 0)  # Green
-                        radius = 10
-                    else:
-                        color = (0, 165, 255)  # Orange
-                        radius = 6
-                    
-                    # Draw circle
-                    cv2.circle(image_with_overlay, (x, y), radius, color, -1)
-                    cv2.circle(image_with_overlay, (x, y), radius, (0, 0, 0), 2)  # Black border
-                    
-                    # Add text label
-                    label = f"{damper_id}:{damper_type}"
-                    cv2.putText(image_with_overlay, label, (x + 10, y - 10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                    cv2.putText(image_with_overlay, f"{confidence:.2f}", (x + 10, y + 5), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+damper_records = [record for record in damper_records if len(record[0]) >= 2]
+damper_coords = np.array([coords for coords, _, _, _ in damper_records], dtype=np.float64)
+damper_types = [damper_type for _, damper_type, _, _ in damper_records]
+damper_confidences = [confidence for _, _, confidence, _ in damper_records]
+damper_ids = [damper_id for _, _, _, damper_id in damper_records]
+
+# Convert all damper coordinates to image space at once, ignoring any z value
+damper_xy = to_image_points(damper_coords[:, :2] if len(damper_coords) else [], pdf_to_image).reshape(-1, 2)
+
+# Color code by type (BGR format for OpenCV)
+damper_styles = [DAMPER_STYLES.get(damper_type, DEFAULT_DAMPER_STYLE) for damper_type in damper_types]
+
+# Draw dampers as points, in damper order so later markers cover earlier ones
+for (x, y), (color, radius) in zip(damper_xy.tolist(), damper_styles):
+    cv2.circle(image_with_overlay, (x, y), radius, color, -1)
+    cv2.circle(image_with_overlay, (x, y), radius, BLACK, 2)  # Black border
+
+# Add text labels on top of all markers
+for (x, y), damper_id, damper_type, confidence in zip(
+        damper_xy.tolist(), damper_ids, damper_types, damper_confidences):
+    cv2.putText(image_with_overlay, f"{damper_id}:{damper_type}", (x + 10, y - 10), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, WHITE, 1)
+    cv2.putText(image_with_overlay, f"{confidence:.2f}", (x + 10, y + 5), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.4, WHITE, 1)
 
 # Add title
 cv2.putText(image_with_overlay, f"Ducts (Blue) and Dampers - Worksheet: {worksheet_id}", 
-           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, WHITE, 2)
 
 # Save the image in the duct_damper_association folder
 import os
 output_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of this script
-output_path = os.path.join(output_dir, f'ducts_dampers_visualization_{worksheet_id}.jpg')
-cv2.imwrite(output_path, image_with_overlay)
-print(f"Visualization saved as: {output_path}")
+output_path = os.path.join(output_dir, f'ducts_dampers_visualization_{worksheet_id}.{OUTPUT_FORMAT}')
 
 # Also save a smaller version for easier viewing
 height, width = image_with_overlay.shape[:2]
 scale_factor = 0.5
 new_width = int(width * scale_factor)
 new_height = int(height * scale_factor)
-resized_image = cv2.resize(image_with_overlay, (new_width, new_height))
-small_output_path = os.path.join(output_dir, f'ducts_dampers_visualization_{worksheet_id}_small.jpg')
-cv2.imwrite(small_output_path, resized_image)
+resized_image = cv2.resize(image_with_overlay, (new_width, new_height), interpolation=cv2.INTER_AREA)
+small_output_path = os.path.join(output_dir, f'ducts_dampers_visualization_{worksheet_id}_small.{OUTPUT_FORMAT}')
+
+# Image encoding releases the GIL, so both images are encoded and written in parallel
+write_image = IMAGE_WRITERS[OUTPUT_FORMAT]
+with ThreadPoolExecutor(max_workers=2) as pool:
+    writes = [
+        pool.submit(write_image, output_path, image_with_overlay),
+        pool.submit(write_image, small_output_path, resized_image),
+    ]
+    for write in writes:
+        write.result()
+print(f"Visualization saved as: {output_path}")
 print(f"Small version saved as: {small_output_path}")
 
 print(f"\nSummary:")